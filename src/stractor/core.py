@@ -1,56 +1,257 @@
-import re
-from tree_sitter import Tree
+import functools
+import hashlib
+import threading
+from collections import OrderedDict
+from tree_sitter import Language, Parser, Query, Tree
 from tree_sitter_language_pack import get_language, get_parser
 
-from stractor.model import Function, Entity, SourceFile
+from stractor.model import SourceFile
+
+
+@functools.lru_cache(maxsize=64)
+def _compile_query(language: str, scm: str, match_limit: int | None = None) -> Query:
+    """Compiles a Tree-sitter query once and shares it across instances.
+    
+    The match limit is part of the cache key, so callers asking for different
+    limits never share, or alter, each other's Query object.
+    
+    Args:
+        language: The name of the language the query targets.
+        scm: The S-expression source of the query.
+        match_limit: Optional cap on in-progress matches, applied at compile time.
+        
+    Returns:
+        The compiled Query object.
+    """
+    query = get_language(language).query(scm)
+    if match_limit is not None:
+        query.set_match_limit(match_limit)
+    return query
+
+
+_TOP_LEVEL_SCM = """
+(module
+    [
+        (import_statement)
+        (import_from_statement)
+    ] @import
+)
+
+(module
+    (expression_statement
+        (assignment) @assignment
+    )
+)
+
+(module
+    (function_definition) @function
+)
+
+(class_definition) @class
+"""
+
+# Pattern indices of _TOP_LEVEL_SCM, in the order they are declared above.
+# Every captured node spans at least one token, so no capture is ever empty.
+_IMPORT_PATTERN, _ATTRIBUTE_PATTERN, _FUNCTION_PATTERN, _CLASS_PATTERN = range(4)
+
+# Cap on in-progress matches per query run, guarding against pathological
+# nesting. Matches beyond the cap are dropped, which the structural
+# queries here never come close to on real code.
+_MATCH_LIMIT = 64
+
+# Statements of a class body that may hold method definitions
+_METHOD_CONTAINERS = frozenset({
+    'block',
+    'decorated_definition',
+    'if_statement',
+    'elif_clause',
+    'else_clause',
+    'try_statement',
+    'except_clause',
+    'except_group_clause',
+    'finally_clause',
+    'with_statement',
+    'for_statement',
+    'while_statement',
+})
 
 
 class Stractor:
     """A code structure extractor using Tree-sitter for parsing Python source code."""
     
-    def __init__(self):
-        self.language = "python"
-        self.parser = get_parser(self.language)
-        self.lang = get_language(self.language)
+    # Per-instance state only; the parser and language are shared through the class
+    __slots__ = ('contents', 'contents_str', '_tree', '_cache', '_cache_size')
+    
+    language = "python"
+    
+    # Shared by all instances, built by the first one to be created
+    _LANG: Language | None = None
+    _QUERIES: dict[str, Query] = {}
+    _init_lock = threading.Lock()
+    # Parsers are stateful and release the GIL while parsing, so each thread gets its own
+    _parsers = threading.local()
+    
+    def __init__(self, cache_size: int = 0):
+        """Create an extractor.
+        
+        Args:
+            cache_size: Maximum number of extracted structures kept for reuse, the
+                least recently used being evicted first. 0 (the default) disables
+                the cache.
+        """
+        self._init_shared_state()
         self.contents = None
-        self.tree : Tree = None
+        self.contents_str = None
+        self._tree: Tree | None = None
+        # Extracted structures keyed by the SHA-256 digest of the encoded source
+        self._cache: OrderedDict[bytes, dict] = OrderedDict()
+        self._cache_size = cache_size
+    
+    @property
+    def tree(self) -> Tree | None:
+        """The tree of the last parsed source, re-parsed on access after a cache hit."""
+        if self._tree is None and self.contents is not None:
+            self._tree = self.parser.parse(self.contents)
+        return self._tree
+    
+    @property
+    def parser(self) -> Parser:
+        """The parser of the calling thread, created on first access."""
+        return self._get_parser()
+    
+    @property
+    def lang(self) -> Language:
+        """The Tree-sitter language shared by all instances."""
+        return self._LANG
     
-    def parse(self, source_code: str, path: str = "") -> SourceFile:
+    @classmethod
+    def _init_shared_state(cls):
+        """Loads the language and compiles the queries on first use."""
+        if cls._LANG is not None:
+            return
+        with cls._init_lock:
+            if cls._LANG is None:
+                cls._QUERIES = {
+                    'top_level': _compile_query(cls.language, _TOP_LEVEL_SCM, _MATCH_LIMIT),
+                }
+                cls._LANG = get_language(cls.language)
+    
+    @classmethod
+    def _get_parser(cls) -> Parser:
+        """Returns the parser of the calling thread, creating it if needed."""
+        parser = getattr(cls._parsers, 'parser', None)
+        if parser is None:
+            parser = get_parser(cls.language)
+            cls._parsers.parser = parser
+        return parser
+    
+    def parse(self, source_code: str | bytes, path: str = "") -> SourceFile:
         """Parse Python source code and extract its structure.
         
         Args:
-            source_code: The Python source code as a string
+            source_code: The Python source code, as a string or as UTF-8 encoded bytes
             path: Optional file path
             
         Returns:
             A SourceFile object containing the parsed structure
         """
-        self.contents = source_code.encode('utf-8')
-        self.tree = self.parser.parse(self.contents)
+        if isinstance(source_code, bytes):
+            # Already what Tree-sitter consumes, no need to encode
+            contents = source_code
+            source_code = None
+        else:
+            contents = source_code.encode('utf-8')
+        
+        if self._cache_size <= 0:
+            return self._build_source_file(self._extract_structure(contents, source_code), path)
+        
+        # Identical sources yield identical structures, only the path may differ
+        key = hashlib.sha256(contents).digest()
+        structure = self._cache.get(key)
+        if structure is None:
+            structure = self._extract_structure(contents, source_code)
+            self._cache[key] = structure
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        else:
+            # Only the structure is kept, the tree is parsed again if it is read
+            self._cache.move_to_end(key)
+            self._set_contents(contents, source_code)
+        
+        return self._build_source_file(structure, path)
+    
+    def _set_contents(self, contents: bytes, source_code: str | None):
+        """Make the given source the current one, dropping the tree of the previous one.
         
-        # Extract top-level documentation
-        documentation = self._get_module_docstring()
+        Args:
+            contents: The UTF-8 encoded source code
+            source_code: The source code as a string, or None if it was given as bytes
+        """
+        self.contents = contents
+        self._tree = None
+        # Byte offsets are also character offsets when the source is pure ASCII
+        if source_code is None:
+            self.contents_str = contents.decode('ascii') if contents.isascii() else None
+        else:
+            self.contents_str = source_code if len(contents) == len(source_code) else None
+    
+    def _extract_structure(self, contents: bytes, source_code: str | None) -> dict:
+        """Parse the encoded source and extract its structure as plain fields.
         
-        # Extract imports
-        imports = self._get_imports()
+        Args:
+            contents: The UTF-8 encoded source code
+            source_code: The source code as a string, or None if it was given as bytes
+            
+        Returns:
+            A dict with the SourceFile fields other than the path, where functions
+            and classes are dicts of their own model fields
+        """
+        self._set_contents(contents, source_code)
         
-        # Extract top-level attributes
-        top_level_attributes = self._get_top_level_attributes()
+        documentation = self._get_module_docstring()
+        imports = []
+        top_level_attributes = []
+        top_level_functions = []
+        entities = []
+        
+        # Walk the tree once and route each match by the pattern that produced it
+        for pattern, captures in self._QUERIES['top_level'].matches(self.tree.root_node):
+            # Every capture is mandatory, read them directly
+            if pattern == _IMPORT_PATTERN:
+                imports.append(self._text(captures['import'][0]))
+            elif pattern == _ATTRIBUTE_PATTERN:
+                top_level_attributes.append(self._text(captures['assignment'][0]))
+            elif pattern == _FUNCTION_PATTERN:
+                top_level_functions.append(self._get_function(captures['function'][0]))
+            elif pattern == _CLASS_PATTERN:
+                entities.append(self._get_class(captures['class'][0]))
+        
+        return {
+            'documentation': documentation,
+            'imports': imports,
+            'top_level_attributes': top_level_attributes,
+            'top_level_functions': top_level_functions,
+            'entities': entities,
+        }
+    
+    def _build_source_file(self, structure: dict, path: str) -> SourceFile:
+        """Build the SourceFile models from extracted fields.
         
-        # Extract top-level functions
-        top_level_functions = self._get_module_functions()
+        Models are only created here, at the API boundary, so every call
+        returns fresh objects and the cached fields are never exposed.
         
-        # Extract classes/entities
-        entities = self._get_classes()
+        The whole tree is validated in a single SourceFile call on purpose:
+        pydantic-core builds the nested models in Rust, which is faster than
+        skipping validation with model_construct, a pure-Python path.
         
-        return SourceFile(
-            path=path,
-            documentation=documentation,
-            imports=imports,
-            top_level_attributes=top_level_attributes,
-            top_level_functions=top_level_functions,
-            entities=entities
-        )
+        Args:
+            structure: The fields returned by _extract_structure
+            path: The file path
+            
+        Returns:
+            A SourceFile object containing the parsed structure
+        """
+        return SourceFile(path=path, **structure)
     
     def _text(self, node):
         """Extracts the text content of a Tree-sitter node.
@@ -63,204 +264,140 @@ class Stractor:
         """
         if node is None:
             return ""
+        # Called for nearly every extracted node, so _slice is inlined here
+        if self.contents_str is not None:
+            return self.contents_str[node.start_byte:node.end_byte]
         return self.contents[node.start_byte:node.end_byte].decode('utf-8')
     
-    def _get_node(self, match, key: str):
-        """Extracts a specific node from a Tree-sitter match based on a key.
+    def _slice(self, start: int, end: int) -> str:
+        """Returns the source text between two byte offsets.
         
         Args:
-            match: A Tree-sitter match object.
-            key: The key to look for in the match dictionary.
+            start: The starting byte offset.
+            end: The ending byte offset.
             
         Returns:
-            The first node associated with the key, or None if not found.
+            The source text, sliced directly from the decoded source when it is
+            pure ASCII, or decoded from the UTF-8 bytes otherwise.
         """
-        match_dict = match[1]
-        if key in match_dict:
-            return match_dict[key][0]
-        return None
+        if self.contents_str is not None:
+            return self.contents_str[start:end]
+        return self.contents[start:end].decode('utf-8')
     
-    def _get_module_docstring(self) -> str | None:
-        """Extract the module-level docstring."""
-        docstring_scm = """
-        (module
-            (expression_statement 
-                (string) @doc
-            )
-        )
-        """
+    def _docstring(self, doc_node) -> str:
+        """Extracts the content of a docstring node without its delimiters.
         
-        query = self.lang.query(docstring_scm)
-        matches = query.matches(self.tree.root_node)
-        
-        if matches:
-            # Get the first docstring (module docstring)
-            first_match = matches[0]
-            doc_node = self._get_node(first_match, 'doc')
-            if doc_node:
-                doc_text = self._text(doc_node)
-                # Clean up the docstring by removing quotes and extra whitespace
-                doc_text = doc_text.strip('\'"')
-                doc_text = doc_text.strip()
-                return doc_text if doc_text else None
-        
-        return None
-    
-    def _get_imports(self) -> list[str]:
-        """Extract import statements from the parsed Python file."""
-        imports_scm = """
-        (module
-            (import_statement)? @import
-            (import_from_statement)? @import
-            )
+        Args:
+            doc_node: A Tree-sitter string node.
+            
+        Returns:
+            The text between the opening and closing quotes, with surrounding
+            whitespace removed.
         """
+        # string_start holds the prefix and opening quotes, string_end the closing ones
+        start = doc_node.child(0)
+        end = doc_node.child(doc_node.child_count - 1)
+        return self._slice(start.end_byte, end.start_byte).strip()
+    
+    def _leading_docstring(self, node):
+        """Finds the docstring opening a module or block node.
         
-        query = self.lang.query(imports_scm)
-        captures = query.captures(self.tree.root_node)
+        Only the first statement is inspected, so the search stops after a
+        single node regardless of the size of the module or block.
         
-        imports = []
-        for node in captures['import']:
-            import_text = self._text(node)
-            if import_text:
-                imports.append(import_text)
-        
-        return imports
-    
-    def _get_top_level_attributes(self) -> list[str]:
-        """Extract top-level variable assignments from the parsed Python file."""
-        attributes_scm = """
-        (module
-            (expression_statement
-                (assignment) @assignment
-            )           
-        )
+        Args:
+            node: The Tree-sitter module or block node.
+            
+        Returns:
+            Tuple of (statement, string) nodes of the docstring, or (None, None)
+            if the first statement is not a string
         """
+        if node.named_child_count == 0:
+            return None, None
         
-        query = self.lang.query(attributes_scm)
-        captures = query.captures(self.tree.root_node)
+        first = node.named_child(0)
+        while first is not None and first.type == 'comment':
+            first = first.next_named_sibling
         
-        attributes = []
-        for node in captures['assignment']:
-            attr_text = self._text(node)
-            if attr_text:
-                attributes.append(attr_text)
+        if first is not None and first.type == 'expression_statement':
+            doc_node = first.named_child(0)
+            if doc_node is not None and doc_node.type == 'string':
+                return first, doc_node
         
-        return attributes
+        return None, None
     
-    def _get_module_functions(self) -> list[Function]:
-        """Extract top-level function definitions."""
-        functions_scm = """
-        (module
-            (function_definition
-                name: (identifier) @name
-                parameters: (parameters) @params
-                return_type: (type)? @return_type
-                body: (block) @body
-            )
-        )
-        """
-        
-        query = self.lang.query(functions_scm)
-        matches = query.matches(self.tree.root_node)
+    def _get_module_docstring(self) -> str | None:
+        """Extract the module-level docstring."""
+        _, doc_node = self._leading_docstring(self.tree.root_node)
+        if doc_node is None:
+            return None
         
-        functions = []
-        for match in matches:
-            name = self._text(self._get_node(match, 'name'))
-            params = self._text(self._get_node(match, 'params'))
-            return_type = self._text(self._get_node(match, 'return_type'))
-            body_node = self._get_node(match, 'body')
-            
-            # Extract docstring and body
-            doc, body = self._extract_docstring_and_body(body_node)
-            
-            # Clean up parameters (remove outer parentheses)
-            if params:
-                params = params.strip('()')
-            
-            functions.append(Function(
-                name=name,
-                parameters=params if params else None,
-                return_type=return_type if return_type else None,
-                documentation=doc if doc else None,
-                body=body if body else None
-            ))
-        
-        return functions
+        doc_text = self._docstring(doc_node)
+        return doc_text if doc_text else None
     
-    def _get_classes(self) -> list[Entity]:
-        """Extract class definitions and their methods."""
-        classes_scm = """
-        (class_definition
-            name: (identifier) @name
-            superclasses: (argument_list)? @superclasses
-            body: (block
-                (expression_statement (string))? @doc
-            )
-        ) @class_node
-        """
-        
-        query = self.lang.query(classes_scm)
-        matches = query.matches(self.tree.root_node)
-        
-        entities = []
-        for match in matches:
-            name = self._text(self._get_node(match, 'name'))
-            doc = self._text(self._get_node(match, 'doc'))
-            class_node = self._get_node(match, 'class_node')
-            
-            # Clean up docstring
-            if doc:
-                doc = doc.strip('\'"').strip()
-            
-            # Extract methods for this class
-            methods = self._get_methods_of_class(class_node)
-            
-            entities.append(Entity(
-                name=name,
-                type='class',
-                documentation=doc if doc else None,
-                methods=methods
-            ))
-        
-        return entities
+    def _get_function(self, function_node) -> dict:
+        """Extract the Function fields of a function definition node."""
+        name = self._text(function_node.child_by_field_name('name'))
+        params = self._text(function_node.child_by_field_name('parameters'))
+        return_type = self._text(function_node.child_by_field_name('return_type'))
+        body_node = function_node.child_by_field_name('body')
+        
+        # Extract docstring and body
+        doc, body = self._extract_docstring_and_body(body_node)
+        
+        # Clean up parameters (remove outer parentheses)
+        if params.startswith('(') and params.endswith(')'):
+            params = params[1:-1]
+        
+        return {
+            'name': name,
+            'parameters': params if params else None,
+            'return_type': return_type if return_type else None,
+            'documentation': doc if doc else None,
+            'body': body if body else None,
+        }
     
-    def _get_methods_of_class(self, class_node) -> list[Function]:
-        """Extract methods from a given class node."""
-        methods_scm = """
-        (function_definition
-            name: (identifier) @name
-            parameters: (parameters) @params
-            return_type: (type)? @return_type
-            body: (block) @body
-        )
-        """
+    def _get_class(self, class_node) -> dict:
+        """Extract the Entity fields, including methods, of a class definition node."""
+        name = self._text(class_node.child_by_field_name('name'))
+        body = class_node.child_by_field_name('body')
         
-        query = self.lang.query(methods_scm)
-        matches = query.matches(class_node)
+        # The docstring and the methods are both harvested from the one class body
+        doc = None
+        methods = []
+        if body is not None:
+            _, doc_node = self._leading_docstring(body)
+            if doc_node is not None:
+                doc = self._docstring(doc_node)
+            methods = self._get_methods_of_class(body)
+        
+        return {
+            'name': name,
+            'type': 'class',
+            'documentation': doc if doc else None,
+            'methods': methods,
+        }
+    
+    def _get_methods_of_class(self, body) -> list[dict]:
+        """Extract the methods defined in a given class body.
         
+        Methods nested in conditional or other compound statements of the class
+        body are included; functions defined inside methods or nested classes are not.
+        """
         methods = []
-        for match in matches:
-            name = self._text(self._get_node(match, 'name'))
-            params = self._text(self._get_node(match, 'params'))
-            return_type = self._text(self._get_node(match, 'return_type'))
-            body_node = self._get_node(match, 'body')
-            
-            # Extract docstring and body
-            doc, body = self._extract_docstring_and_body(body_node)
-            
-            # Clean up parameters (remove outer parentheses)
-            if params:
-                params = params.strip('()')
+        
+        # Walk the class body with a single cursor, no query needed
+        cursor = body.walk()
+        while True:
+            node = cursor.node
+            if node.type == 'function_definition':
+                methods.append(self._get_function(node))
+            elif node.type in _METHOD_CONTAINERS and cursor.goto_first_child():
+                continue
             
-            methods.append(Function(
-                name=name,
-                parameters=params if params else None,
-                return_type=return_type if return_type else None,
-                documentation=doc if doc else None,
-                body=body if body else None
-            ))
-        
-        return methods
+            while not cursor.goto_next_sibling():
+                if not cursor.goto_parent():
+                    return methods
     
     def _extract_docstring_and_body(self, body_node):
         """Extract docstring and body from a function's block node.
@@ -276,46 +413,29 @@ class Stractor:
         
         full_body_text = self._text(body_node)
         
-        # Query to find docstring in the body
-        docstring_scm = """
-        (block
-            (expression_statement 
-                (string) @doc
-            )
-        )
-        """
-        
-        query = self.lang.query(docstring_scm)
-        matches = query.matches(body_node)
-        
         docstring = None
         body = full_body_text
         
-        if matches:
-            # Get the first docstring
-            first_match = matches[0]
-            doc_node = self._get_node(first_match, 'doc')
-            if doc_node:
-                docstring_text = self._text(doc_node)
-                # Clean up the docstring by removing quotes and extra whitespace
-                docstring = docstring_text.strip('\'"').strip()
-                
-                # Remove the docstring from the body
-                # Find the docstring in the full body and remove it
-                docstring_with_quotes = self._text(doc_node)
-                body_lines = full_body_text.split('\n')
-                filtered_lines = []
-                skip_docstring = False
-                
-                for line in body_lines:
-                    if docstring_with_quotes.strip() in line and not skip_docstring:
-                        skip_docstring = True
-                        continue
-                    if not skip_docstring or line.strip():
-                        filtered_lines.append(line)
-                        skip_docstring = False
-                
-                body = '\n'.join(filtered_lines).strip()
+        doc_statement, doc_node = self._leading_docstring(body_node)
+        if doc_node is not None:
+            docstring = self._docstring(doc_node)
+            
+            # The body starts at the statement after the docstring, which skips
+            # any ';' or comment following it on the same line
+            doc_line = doc_statement.end_point[0]
+            next_statement = doc_statement.next_named_sibling
+            while (next_statement is not None and next_statement.type == 'comment'
+                   and next_statement.start_point[0] == doc_line):
+                next_statement = next_statement.next_named_sibling
+
+            # Comments alone do not make a body
+            first_statement = next_statement
+            while first_statement is not None and first_statement.type == 'comment':
+                first_statement = first_statement.next_named_sibling
+            if first_statement is None:
+                body = ""
+            else:
+                body = self._slice(next_statement.start_byte, body_node.end_byte).strip()
         
         # Clean up body - remove outer braces and extra whitespace
         if body:
@@ -125,3 +125,221 @@ def test_parse_source_code(python_source_code):
             assert actual_method.return_type == expected_method.return_type
             assert actual_method.documentation == expected_method.documentation
             assert actual_method.body == expected_method.body
+
+def test_parse_source_without_imports_or_attributes():
+    stractor = Stractor()
+    res = stractor.parse('def main():\n    pass\n')
+
+    assert res.imports == []
+    assert res.top_level_attributes == []
+    assert [f.name for f in res.top_level_functions] == ["main"]
+
+def test_function_docstring_must_be_first_statement():
+    stractor = Stractor()
+    res = stractor.parse(
+        'def documented():\n'
+        '    # leading comment\n'
+        '    """Real docstring."""\n'
+        '    return 1\n'
+        '\n'
+        'def undocumented():\n'
+        '    import os\n'
+        '    """Not a docstring."""\n'
+    )
+
+    documented, undocumented = res.top_level_functions
+    assert documented.documentation == "Real docstring."
+    assert documented.body == "return 1"
+    assert undocumented.documentation is None
+
+def test_multiline_docstring_is_removed_from_body():
+    stractor = Stractor()
+    res = stractor.parse(
+        'def run():\n'
+        '    """Run the job.\n'
+        '\n'
+        '    Returns nothing.\n'
+        '    """\n'
+        '    job = make_job()\n'
+        '    job.start()\n'
+    )
+
+    run = res.top_level_functions[0]
+    assert run.documentation == "Run the job.\n\n    Returns nothing."
+    assert run.body == "job = make_job()\n    job.start()"
+
+def test_docstring_delimiters_are_stripped_exactly():
+    stractor = Stractor()
+    res = stractor.parse(
+        'r"""Raw module docs."""\n'
+        '\n'
+        'class Watcher:\n'
+        '    """\'Safe\' watcher."""\n'
+    )
+
+    assert res.documentation == "Raw module docs."
+    assert res.entities[0].documentation == "'Safe' watcher."
+
+def test_parameters_keep_parentheses_inside_defaults():
+    stractor = Stractor()
+    res = stractor.parse('def merge(items=(), extra=()):\n    pass\n')
+
+    assert res.top_level_functions[0].parameters == "items=(), extra=()"
+
+def test_parse_reuses_cached_result_for_identical_source(python_source_code, monkeypatch):
+    stractor = Stractor(cache_size=8)
+    first = stractor.parse(python_source_code, "a.py")
+    first.entities[0].methods.clear()
+
+    calls = []
+    extract = Stractor._extract_structure
+    monkeypatch.setattr(Stractor, "_extract_structure", lambda self, *args: calls.append(args) or extract(self, *args))
+    second = stractor.parse(python_source_code, "b.py")
+
+    assert calls == []
+    assert second.path == "b.py"
+    assert [m.name for m in second.entities[0].methods] == ["chat_stream", "chat"]
+    assert second.top_level_functions == first.top_level_functions
+
+def test_cache_hit_restores_parse_state():
+    stractor = Stractor(cache_size=8)
+    stractor.parse('import a\n')
+    stractor.parse('import b\n')
+    stractor.parse('import a\n')
+
+    assert stractor._tree is None
+    assert stractor.tree.root_node.text == b'import a\n'
+    assert stractor.contents == b'import a\n'
+    assert stractor.contents_str == 'import a\n'
+
+def test_cache_evicts_least_recently_used_source(monkeypatch):
+    stractor = Stractor(cache_size=2)
+    stractor.parse('import a\n')
+    stractor.parse('import b\n')
+    stractor.parse('import a\n')
+    stractor.parse('import c\n')
+
+    calls = []
+    extract = Stractor._extract_structure
+    monkeypatch.setattr(Stractor, "_extract_structure", lambda self, *args: calls.append(args) or extract(self, *args))
+    stractor.parse('import a\n')
+    stractor.parse('import b\n')
+
+    assert [contents for contents, _ in calls] == [b'import b\n']
+
+def test_cache_is_disabled_by_default(monkeypatch):
+    stractor = Stractor()
+    stractor.parse('import a\n')
+
+    calls = []
+    extract = Stractor._extract_structure
+    monkeypatch.setattr(Stractor, "_extract_structure", lambda self, *args: calls.append(args) or extract(self, *args))
+    stractor.parse('import a\n')
+
+    assert [contents for contents, _ in calls] == [b'import a\n']
+    assert len(stractor._cache) == 0
+
+def test_methods_are_collected_from_class_body_only():
+    stractor = Stractor()
+    res = stractor.parse(
+        'class Service:\n'
+        '    @property\n'
+        '    def name(self):\n'
+        '        def helper():\n'
+        '            pass\n'
+        '        return helper\n'
+        '\n'
+        '    if not TYPE_CHECKING:\n'
+        '        def __getattr__(self, item):\n'
+        '            pass\n'
+        '\n'
+        '    class Config:\n'
+        '        def prepare(self):\n'
+        '            pass\n'
+    )
+
+    service, config = res.entities
+    assert [m.name for m in service.methods] == ["name", "__getattr__"]
+    assert [m.name for m in config.methods] == ["prepare"]
+
+def test_instances_share_language_queries_and_parser():
+    first, second = Stractor(), Stractor()
+
+    assert first.lang is second.lang
+    assert first._QUERIES['top_level'] is second._QUERIES['top_level']
+    assert first.parser is second.parser
+
+def test_module_docstring_must_be_first_statement():
+    stractor = Stractor()
+
+    assert stractor.parse('#!/usr/bin/env python\n"""Script docs."""\n').documentation == "Script docs."
+    assert stractor.parse('MAX = 10\n"""Attribute docs."""\n').documentation is None
+    assert stractor.parse('').documentation is None
+
+def test_parse_accepts_encoded_source(python_source_code):
+    from_str = Stractor().parse(python_source_code)
+    from_bytes = Stractor().parse(python_source_code.encode('utf-8'))
+
+    assert from_bytes == from_str
+    assert Stractor().parse(b'def run(job):\n    job.start()\n').top_level_functions[0].body == "job.start()"
+
+def test_class_with_attribute_docstrings_is_reported_once():
+    stractor = Stractor()
+    res = stractor.parse(
+        'class Config:\n'
+        '    strict = False\n'
+        '    """Whether to validate strictly."""\n'
+        '    frozen = False\n'
+        '    """Whether instances are immutable."""\n'
+    )
+
+    assert len(res.entities) == 1
+    assert res.entities[0].documentation is None
+
+def test_body_after_docstring_on_same_line():
+    stractor = Stractor()
+    res = stractor.parse(
+        'def f(): "doc"; return 1\n'
+        '\n'
+        'def g():\n'
+        '    """Only docs."""\n'
+        '\n'
+        'def h():\n'
+        '    """Long docs."""  # noqa: E501\n'
+        '    x = 1\n'
+        '\n'
+        'def i():\n'
+        '    """Only docs."""  # noqa: E501\n'
+        '    # nothing else\n'
+        '\n'
+        'def j():\n'
+        '    """Docs."""\n'
+        '    # lazy import\n'
+        '    import os\n'
+    )
+
+    f, g, h, i, j = res.top_level_functions
+    assert f.documentation == "doc"
+    assert f.body == "return 1"
+    assert g.body is None
+    assert h.body == "x = 1"
+    assert i.body is None
+    assert j.body == "# lazy import\n    import os"
+
+def test_deeply_nested_source_stays_within_match_limit():
+    depth = 100
+    source = ''.join(
+        f'{"    " * level}class Level{level}:\n{"    " * (level + 1)}def method(self): pass\n'
+        for level in range(depth)
+    )
+    stractor = Stractor()
+    res = stractor.parse(source)
+
+    assert not stractor._QUERIES['top_level'].did_exceed_match_limit
+    assert len(res.entities) == depth
+    assert all([m.name for m in entity.methods] == ["method"] for entity in res.entities)
+
+def test_match_limit_is_not_shared_with_unlimited_queries():
+    from stractor.core import _TOP_LEVEL_SCM, _compile_query
+
+    assert _compile_query("python", _TOP_LEVEL_SCM).match_limit != Stractor()._QUERIES['top_level'].match_limit